@@ -1,22 +1,38 @@
-import os
-import re
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
 import shutil
 import sys
 import textwrap
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
-import inquirer
-import requests
-from deep_translator import GoogleTranslator
 from loguru import logger
-from recipe_scrapers import AbstractScraper, scrape_html
+from platformdirs import user_cache_dir
 from rich.console import Console
 from rich.markdown import Markdown
 
-REGEX_SPLIT = r"(\d+)(?!.*\d)"  # Used to split a string after its last number
+# Heavy dependencies are imported where they are used to keep the CLI startup fast
+if TYPE_CHECKING:
+    from recipe_scrapers import AbstractScraper
+    from requests import Session
+    from requests_cache import CachedSession
+
+CACHE_EXPIRE_AFTER = 86400  # Seconds after which cached pages and recipes are refreshed
+CACHE_DIR = Path(user_cache_dir("recipe2md"))  # User cache folder of the application
+RECIPE_CACHE_DIR = CACHE_DIR / "recipes"  # Folder storing previously generated recipes
+RECIPE_CACHE_KEYS = ("markdown_content", "file_title", "image_filename", "image_url")  # Fields of a cached recipe
 
 console = Console()
+# Background workers downloading recipe images while the markdown is generated
+executor = ThreadPoolExecutor(max_workers=2)
+# Image downloads started before saving, by image URL; each response can only be read once
+pending_images: dict[str, Future] = {}
 
 click_category = click.option("--category", "-c", type=str, default="", help="Category in which the recipe belongs.")
 click_extras = click.option(
@@ -31,13 +47,16 @@ click_extras = click.option(
 click_translate = click.option(
     "--translate", "-t", is_flag=True, default=False, help="Translate the content of the recipe using Google Translate."
 )
+click_refresh = click.option(
+    "--refresh", "-r", is_flag=True, default=False, help="Ignore the cached recipe page and markdown, and scrape again."
+)
 click_name = click.option("--name", "-n", type=str, default=None, help="Name of the recipe.")
 click_folder = click.option(
     "--out",
     "-o",
-    type=click.Path(exists=True, dir_okay=True, file_okay=False, writable=True, path_type=Path),
+    type=click.Path(dir_okay=True, file_okay=False, writable=True, path_type=Path),
     default=Path("."),
-    help="Folder where the output files are to be stored.",
+    help="Folder where the output files are to be stored, created if missing.",
 )
 
 
@@ -55,8 +74,47 @@ def camel_case_splitter(word: str) -> str:
     Returns:
         str: Sentence created from CamelCase word
     """
-    split = re.sub("([A-Z][a-z]+)", r" \1", re.sub("([A-Z]+)", r" \1", word)).split()
-    return " ".join(split).capitalize()
+    # Nothing to split if there is no uppercase letter past the first character
+    if word[1:].islower():
+        return " ".join(word.split()).capitalize()
+    chars = []
+    for i, char in enumerate(word):
+        # Start a new word on a lower -> upper transition, or at the last letter of an uppercase run
+        if char.isupper() and i > 0 and (not word[i - 1].isupper() or (i + 1 < len(word) and word[i + 1].islower())):
+            chars.append(" ")
+        chars.append(char)
+    return " ".join("".join(chars).split()).capitalize()
+
+
+def configure_session(session: Session) -> Session:
+    """Set the User-Agent of an HTTP session, pool its connections and retry failed requests with a backoff."""
+    from requests.adapters import HTTPAdapter
+    from urllib3.util import Retry
+
+    session.headers["User-Agent"] = "recipe2md"
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=Retry(total=3, backoff_factor=0.3))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@functools.cache
+def get_session() -> CachedSession:
+    """Get the HTTP session caching recipe pages for a day in the user cache directory."""
+    from requests_cache import CachedSession
+
+    return configure_session(CachedSession(CACHE_DIR / "http_cache", expire_after=CACHE_EXPIRE_AFTER))
+
+
+@functools.cache
+def get_image_session() -> Session:
+    """Get the HTTP session downloading recipe images.
+
+    Images bypass the cache, which would read them fully into memory instead of streaming them to disk.
+    """
+    from requests import Session
+
+    return configure_session(Session())
 
 
 def get_console_width() -> int:
@@ -64,30 +122,72 @@ def get_console_width() -> int:
     return min(shutil.get_terminal_size().columns, 80)
 
 
+@functools.cache
+def get_markdown_console() -> Console:
+    """Get the console used to print recipes, limited to the console width at first use."""
+    return Console(width=get_console_width())
+
+
 def clear_console() -> None:
     """Clear the console."""
-    if os.name == "nt":  # For Windows
-        os.system("cls")
-    else:  # For Unix-based systems (Linux, macOS)
-        os.system("clear")
+    console.clear()
+
+
+def format_title(recipe_title: str) -> str:
+    """Format recipe title for use in a filename."""
+    return "-".join(recipe_title.title().split())
+
+
+def get_recipe_cache_file(recipe_url: str, name: str, category: str, extras: tuple[str, ...], translate: bool) -> Path:
+    """Get the cache file of a recipe generated with the given options."""
+    key = json.dumps([recipe_url, name, category, extras, translate])
+    return RECIPE_CACHE_DIR / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
 
 
-def format_title(scraper: dict) -> str:
-    """Format recipe title."""
-    return scraper.title().replace(" ", "-")
+def load_cached_recipe(cache_file: Path) -> dict | None:
+    """Load a previously generated recipe, if it exists and has not expired. Expired recipes are deleted."""
+    try:
+        if time.time() - cache_file.stat().st_mtime > CACHE_EXPIRE_AFTER:
+            cache_file.unlink(missing_ok=True)
+            return None
+        recipe = json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    # Ignore entries written in another format
+    if not isinstance(recipe, dict) or not all(isinstance(recipe.get(key), str) for key in RECIPE_CACHE_KEYS):
+        return None
+    return recipe
+
+
+def store_cached_recipe(cache_file: Path, recipe: dict) -> None:
+    """Store a generated recipe for later runs, ignoring failures since the cache is optional.
+
+    Expired recipes left by previous runs are deleted at the same time.
+    """
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        for stale_file in cache_file.parent.glob("*.json"):
+            if time.time() - stale_file.stat().st_mtime > CACHE_EXPIRE_AFTER:
+                stale_file.unlink(missing_ok=True)
+        cache_file.write_text(json.dumps(recipe), encoding="utf-8")
+    except OSError as e:
+        logger.warning(f"Could not cache recipe, error: {str(e)}")
 
 
-def scrape_recipe(recipe_url: str) -> type[AbstractScraper]:
+def scrape_recipe(recipe_url: str, refresh: bool = False) -> type[AbstractScraper]:
     """Scrape the recipe webpage using the recipe_scraper module.
 
     Args:
         recipe_url (str): URL of the recipe.
+        refresh (bool): Flag on whether to fetch the webpage again instead of using the cached one.
 
     Returns:
         AbstractScraper: instance of a subclass of AbstractScraper containing the recipe information.
     """
+    from recipe_scrapers import scrape_html
+
     try:
-        html = requests.get(recipe_url, headers={"User-Agent": "recipe2md"}).content
+        html = get_session().get(recipe_url, force_refresh=refresh).content
         scraper = scrape_html(html, org_url=recipe_url, wild_mode=True)
         return scraper
     except Exception as e:
@@ -95,9 +195,30 @@ def scrape_recipe(recipe_url: str) -> type[AbstractScraper]:
         sys.exit(1)
 
 
+def translate_text(text: str) -> str:
+    """Translate a text to English using Google Translate.
+
+    A translator is created per text since GoogleTranslator stores the text being translated on the instance.
+    """
+    from deep_translator import GoogleTranslator
+
+    return GoogleTranslator(source="auto", target="en").translate(text)
+
+
+def download_image(image_url: str) -> Future:
+    """Start downloading a recipe image in the background."""
+    return executor.submit(get_image_session().get, image_url, stream=True)
+
+
 def generate_markdown(
-    recipe_url: str, name: str, category: str, extras: list[str], translate: bool
-) -> (str, str, type[AbstractScraper]):
+    recipe_url: str,
+    name: str,
+    category: str,
+    extras: list[str],
+    translate: bool,
+    refresh: bool = False,
+    prefetch_image: bool = False,
+) -> (str, str, str, str):
     """Given a recipe URL, scrape and generate the markdown content.
 
     Args:
@@ -106,31 +227,50 @@ def generate_markdown(
         category (str): Category in which the recipe belongs.
         extras (list[str]): Extra tags for the recipe (among spicy, sweet, salty, sour, bitter, and umami).
         translate (bool): Flag on whether to translate the recipe using Google Translate.
+        refresh (bool): Flag on whether to scrape the recipe again instead of using the cached one.
+        prefetch_image (bool): Flag on whether to start downloading the accompanying image in the background.
 
     Returns:
-        (str, str, AbstractScraper): Markdown content for the recipe, image filename and scraped data dictionary.
+        (str, str, str, str): Markdown content for the recipe, formatted title for the filenames, image filename
+            and URL of the accompanying image.
     """
-    scraper = scrape_recipe(recipe_url)
+    # Reuse the recipe generated by a previous run with the same options
+    cache_file = get_recipe_cache_file(recipe_url, name, category, tuple(extras), translate)
+    recipe = None if refresh else load_cached_recipe(cache_file)
+    if recipe is not None:
+        if prefetch_image:
+            pending_images[recipe["image_url"]] = download_image(recipe["image_url"])
+        return recipe["markdown_content"], recipe["file_title"], recipe["image_filename"], recipe["image_url"]
+
+    scraper = scrape_recipe(recipe_url, refresh)
 
     # Format title
     title = scraper.title() if name is None else name
     ingredients = scraper.ingredients()
     instructions = scraper.instructions_list()
+    nutrients = scraper.nutrients()
+    image_url = scraper.image()
 
-    # Download accompanying image
-    image_file_extension = scraper.image().split(".")[-1]
-    image_filename = f"{format_title(title)}.{image_file_extension}"
+    # Download accompanying image in the background
+    if prefetch_image:
+        pending_images[image_url] = download_image(image_url)
+    image_file_extension = image_url.split(".")[-1]
+    file_title = format_title(title)
+    image_filename = f"{file_title}.{image_file_extension}"
 
     # Handle translation if flagged
     if translate:
-        translator = GoogleTranslator(source="auto", target="en")
-        title = translator.translate(title)
-        ingredients = map(translator.translate, ingredients)
-        instructions = map(translator.translate, instructions)
+        # Each text is a separate request, so translate a few of them concurrently
+        with ThreadPoolExecutor(max_workers=3) as translation_executor:
+            translated = list(translation_executor.map(translate_text, [title, *ingredients, *instructions]))
+        title = translated[0]
+        ingredients = translated[1 : 1 + len(ingredients)]
+        instructions = translated[1 + len(ingredients) :]
 
     # Markdown content
-    markdown_content = ""
-    markdown_content += textwrap.dedent(f"""\
+    parts = []
+    parts.append(
+        textwrap.dedent(f"""\
             ---
             title: {title.capitalize()}
             category: {category.capitalize()}
@@ -138,22 +278,36 @@ def generate_markdown(
             image: {image_filename}
             size: {scraper.yields()}
             time: {scraper.total_time()} mins\n""")
+    )
     # Nutrition components
-    if len(scraper.nutrients()) > 0:
-        markdown_content += "nutrition:\n"
-        for nutrient, quantity in scraper.nutrients().items():
-            markdown_content += f"\t- {camel_case_splitter(nutrient).replace(' content', '')} {quantity}\n"
+    if nutrients:
+        parts.append("nutrition:\n")
+        parts.append(
+            "".join(
+                f"\t- {camel_case_splitter(nutrient).removesuffix(' content')} {quantity}\n"
+                for nutrient, quantity in nutrients.items()
+            )
+        )
     for extra in extras:
-        markdown_content += f"{extra}: x\n"
-    markdown_content += "---\n\n"
+        parts.append(f"{extra}: x\n")
+    parts.append("---\n\n")
     # Print all ingredients
-    for ingredient in ingredients:
-        markdown_content += f"* {ingredient}\n"
-    markdown_content += "\n"
+    parts.append("".join(f"* {ingredient}\n" for ingredient in ingredients))
+    parts.append("\n")
     # Print all instructions
-    markdown_content += "\n\n---\n\n".join([f"> {instruction}" for instruction in instructions])
+    parts.append("\n\n---\n\n".join(f"> {instruction}" for instruction in instructions))
+    markdown_content = "".join(parts)
 
-    return markdown_content, image_filename, scraper
+    store_cached_recipe(
+        cache_file,
+        {
+            "markdown_content": markdown_content,
+            "file_title": file_title,
+            "image_filename": image_filename,
+            "image_url": image_url,
+        },
+    )
+    return markdown_content, file_title, image_filename, image_url
 
 
 def print_markdown(md_content: str) -> None:
@@ -163,51 +317,73 @@ def print_markdown(md_content: str) -> None:
         md_content (str): Markdown content to print.
     """
     clear_console()
-    console_width = get_console_width()
-    console = Console(width=console_width)
     md = Markdown(md_content)
-    console.print("\n", md, "\n")
+    get_markdown_console().print("\n", md, "\n")
 
 
 def save_md_to_file(
-    markdown_content: str, name: str, image_filename: str, scraper: type[AbstractScraper], out: Path
-) -> str:
+    markdown_content: str,
+    file_title: str,
+    image_filename: str,
+    image_url: str,
+    out: Path,
+) -> (Path, Path):
     """Save recipe Markdown to file and download accompanying image.
 
     Args:
         markdown_content (str): Markdown content for the recipe.
-        name (str): Name of recipe for the metadata and filename.
+        file_title (str): Formatted recipe title used for the markdown filename.
         image_filename (str): Filename for the accompanying image.
-        scraper (AbstractScraper): Dictionary containing scraped data.
+        image_url (str): URL of the accompanying image.
         out (Path): Folder where the output files are to be stored.
 
     Returns:
-        (str, str): Path to saved markdown file and saved image.
+        (Path, Path): Path to saved markdown file and saved image.
     """
-    # Format title, create markdown file
-    title = format_title(scraper.title()) if name is None else format_title(name)
-    recipe_file = out / f"{title}.md"
+    # Create output folder and markdown file
+    out.mkdir(parents=True, exist_ok=True)
+    recipe_file = out / f"{file_title}.md"
 
     # Download accompanying image
     image_path = out / image_filename
-    image_data = requests.get(scraper.image()).content
-    with open(image_path, "wb") as image_file:
-        image_file.write(image_data)
+    image_future = pending_images.pop(image_url, None)
+    if image_future is None:
+        image_future = download_image(image_url)
+    with image_future.result() as response, open(image_path, "wb") as image_file:
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            image_file.write(chunk)
 
-    with open(recipe_file, "w+") as text_file:
-        text_file.write(markdown_content)
-    return recipe_file, image_file
+    recipe_file.write_text(markdown_content, encoding="utf-8")
+    return recipe_file, image_path
+
+
+def confirm_save() -> bool:
+    """Ask the user whether to save the recipe, closed input or Ctrl-C counting as a no."""
+    try:
+        return click.confirm("Save this recipe?", default=True)
+    except click.Abort:
+        click.echo()
+        return False
 
 
 @cli.command(help="Scrape a recipe URL and print a markdown-formatted recipe to terminal output.")
 @click.argument("recipe_url")
 @click.option("--prompt-save", default=True, help="Turn on/off the prompt to save the markdown output to file.")
+@click_name
 @click_category
 @click_extras
 @click_translate
+@click_refresh
 @click_folder
 def view(
-    recipe_url: str, prompt_save: bool, name: str, category: str, extras: list[str], translate: bool, out: Path
+    recipe_url: str,
+    prompt_save: bool,
+    name: str,
+    category: str,
+    extras: list[str],
+    translate: bool,
+    refresh: bool,
+    out: Path,
 ) -> None:
     """Scrape a recipe URL and print a markdown-formatted recipe to terminal output.
 
@@ -218,30 +394,21 @@ def view(
         category (str): Category in which the recipe belongs.
         extras (list[str]): Extra tags for the recipe (among veggie, spicy, sweet, salty, sour, bitter, and umami).
         translate (bool): Flag on whether to translate the recipe using Google Translate.
+        refresh (bool): Flag on whether to scrape the recipe again instead of using the cached one.
         out (Path): Folder where the output files are to be stored.
     """
     try:
-        md_content, image_filename, scraper = generate_markdown(recipe_url, name, category, extras, translate)
+        md_content, file_title, image_filename, image_url = generate_markdown(
+            recipe_url, name, category, extras, translate, refresh
+        )
         print_markdown(md_content)
 
-        if prompt_save:
-            after_view_question = [
-                inquirer.List(
-                    "after_view",
-                    message="What would you like to do next?",
-                    choices=["Save this recipe", "Quit"],
-                )
-            ]
-
-            after_view_answer = inquirer.prompt(after_view_question)
-            if after_view_answer["after_view"] == "Save this recipe":
-                try:
-                    save_md_to_file(md_content, name, image_filename, scraper)
-                    logger.info("Recipe saved successfully.")
-                except Exception as e:
-                    logger.error(f"Error saving the recipe: {str(e)}")
-            elif after_view_answer["after_view"] == "Quit":
-                return
+        if prompt_save and confirm_save():
+            try:
+                save_md_to_file(md_content, file_title, image_filename, image_url, out)
+                logger.info("Recipe saved successfully.")
+            except Exception as e:
+                logger.error(f"Error saving the recipe: {str(e)}")
     except OSError as e:
         logger.error(f"I/O error({e.errno}): {e.strerror}")
     except Exception as e:
@@ -254,8 +421,11 @@ def view(
 @click_category
 @click_extras
 @click_translate
+@click_refresh
 @click_folder
-def save(recipe_url: str, name: str, category: str, extras: list[str], translate: bool, out: Path) -> None:
+def save(
+    recipe_url: str, name: str, category: str, extras: list[str], translate: bool, refresh: bool, out: Path
+) -> None:
     """Scrape recipe from URL, parse to Markdown and save to file.
 
     Args:
@@ -264,10 +434,13 @@ def save(recipe_url: str, name: str, category: str, extras: list[str], translate
         category (str): Category in which the recipe belongs.
         extras (list[str]): Extra tags for the recipe (among veggie, spicy, sweet, salty, sour, bitter, and umami).
         translate (bool): Flag on whether to translate the recipe using Google Translate.
+        refresh (bool): Flag on whether to scrape the recipe again instead of using the cached one.
         out (Path): Folder where the output files are to be stored.
     """
-    md_content, image_filename, scraper = generate_markdown(recipe_url, name, category, extras, translate)
-    save_md_to_file(md_content, name, image_filename, scraper, out)
+    md_content, file_title, image_filename, image_url = generate_markdown(
+        recipe_url, name, category, extras, translate, refresh, prefetch_image=True
+    )
+    save_md_to_file(md_content, file_title, image_filename, image_url, out)
 
 
 if __name__ == "__main__":